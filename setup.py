@@ -30,6 +30,7 @@ setup(
     license="GNU Lesser General Public License",
     packages=find_packages(exclude=('tests', 'docs')),
     test_suite='setup.vcr_test_suite',
+    python_requires='>=3.4',
     setup_requires=[],
     tests_require=['requests'],
     platforms='OS Independent',
@@ -41,10 +42,7 @@ setup(
             '(LGPLv3)',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
         'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6'],
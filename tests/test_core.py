@@ -1,40 +1,35 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
+import contextlib
 import os
+import shutil
 import unittest
+from urllib.request import urlopen
 import warnings
 
 from vcr import vcr, VCRSystem
-from vcr.utils import catch_stdout, skip_if_py2
-
-try:
-    # Py2
-    from urllib2 import urlopen
-    # add assertRaisesRegex (assertRaisesRegexp is deprecated in Py3)
-    unittest.TestCase.assertRaisesRegex = unittest.TestCase.assertRaisesRegexp
-except ImportError:
-    # Py3
-    from urllib.request import urlopen
+from vcr import core
+from vcr.core import _tape_cache
+from vcr.utils import catch_stdout
 
 
 class CoreTestCase(unittest.TestCase):
     """
     Test suite for vcr
     """
-    def setUp(self):
-        # Directory where the test files are located
-        self.path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
-        self.temp_test_vcr = os.path.join(self.path, 'test_core.temp_test.vcr')
-        self.read_test_vcr = os.path.join(self.path, 'test_core.read_test.vcr')
+    # Directory where the test files are located
+    path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
+    temp_test_vcr = os.path.join(path, 'test_core.temp_test.vcr')
+    read_test_vcr = os.path.join(path, 'test_core.read_test.vcr')
 
     def tearDown(self):
         # cleanup temporary files
-        try:
+        with contextlib.suppress(OSError):
             os.remove(self.temp_test_vcr)
-        except OSError:
-            pass
 
+    @unittest.skipUnless(os.environ.get('VCR_RUN_CONNECTIVITY'),
+                         'set VCR_RUN_CONNECTIVITY=1 to run live network test')
     def test_connectivity(self):
         # basic network connection test to exclude network issues
         r = urlopen('https://www.python.org/')
@@ -83,7 +78,6 @@ class CoreTestCase(unittest.TestCase):
         # .vcr file should not exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), False)
 
-    @skip_if_py2
     def test_record(self):
         # define function with @vcr decorator
         @vcr
@@ -102,7 +96,6 @@ class CoreTestCase(unittest.TestCase):
         # .vcr file should now exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), True)
 
-    @skip_if_py2
     def test_record_with_debug(self):
         # define function with @vcr decorator
         @vcr(debug=True)
@@ -121,7 +114,6 @@ class CoreTestCase(unittest.TestCase):
         # .vcr file should now exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), True)
 
-    @skip_if_py2
     def test_life_cycle(self):
         # define function with @vcr decorator and enable debug mode
         @vcr(debug=True)
@@ -144,12 +136,11 @@ class CoreTestCase(unittest.TestCase):
         self.assertEqual(os.path.exists(self.temp_test_vcr), True)
 
         # re-run the test - this time it should be using the recorded file
-        with catch_stdout() as out:
+        with catch_stdout(out):
             temp_test()
             # debug mode should state its in playback mode
             self.assertIn('VCR PLAYBACK', out.getvalue())
 
-    @skip_if_py2
     def test_overwrite_true(self):
         # overwrite=True will delete a existing tape and create a new file
         @vcr(overwrite=True)
@@ -165,7 +156,6 @@ class CoreTestCase(unittest.TestCase):
         temp_test()
         self.assertTrue(os.path.getmtime(self.temp_test_vcr) > mtime)
 
-    @skip_if_py2
     def test_overwrite_false(self):
         # overwrite=False is default behaviour
         @vcr(overwrite=False)
@@ -182,7 +172,6 @@ class CoreTestCase(unittest.TestCase):
         # mtime didn't change as the file has not been overwritten
         self.assertEqual(os.path.getmtime(self.temp_test_vcr), mtime)
 
-    @skip_if_py2
     def test_tape_name(self):
         @vcr(tape_name='test_core.temp_test.vcr')
         def custom_test():
@@ -202,18 +191,15 @@ class VCRSystemTestCase(unittest.TestCase):
     """
     Test suite for VCRSystem
     """
-    def setUp(self):
-        # Directory where the test files are located
-        self.path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
-        self.temp_test_vcr = os.path.join(self.path, 'test_core.temp_test.vcr')
-        self.read_test_vcr = os.path.join(self.path, 'test_core.read_test.vcr')
+    # Directory where the test files are located
+    path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
+    temp_test_vcr = os.path.join(path, 'test_core.temp_test.vcr')
+    read_test_vcr = os.path.join(path, 'test_core.read_test.vcr')
 
     def tearDown(self):
         # cleanup temporary files
-        try:
+        with contextlib.suppress(OSError):
             os.remove(self.temp_test_vcr)
-        except OSError:
-            pass
         # reset to default settings
         VCRSystem.reset()
 
@@ -232,18 +218,17 @@ class VCRSystemTestCase(unittest.TestCase):
         # now enable global debug mode
         VCRSystem.debug = True
         # re-run the test
-        with catch_stdout() as out:
+        with catch_stdout(out):
             read_test()
             self.assertIn('VCR PLAYBACK', out.getvalue())
 
         # reset
         VCRSystem.reset()
         # re-run the test - again no output
-        with catch_stdout() as out:
+        with catch_stdout(out):
             read_test()
             self.assertEqual(out.getvalue(), '')
 
-    @skip_if_py2
     def test_overwrite(self):
         # no overwrite setting in decorator level
         @vcr
@@ -293,18 +278,17 @@ class VCRSystemTestCase(unittest.TestCase):
         # now enable disabled mode
         VCRSystem.disabled = True
         # re-run the test - there should be no output
-        with catch_stdout() as out:
+        with catch_stdout(out):
             read_test()
             self.assertEqual(out.getvalue(), '')
 
         # reset
         VCRSystem.reset()
         # re-run the test - again output due to debug mode on decorator level
-        with catch_stdout() as out:
+        with catch_stdout(out):
             read_test()
             self.assertIn('VCR PLAYBACK', out.getvalue())
 
-    @skip_if_py2
     def test_playback_only(self):
         # define decorated function without existing vcr tape
         @vcr(debug=True)
@@ -336,7 +320,6 @@ class VCRSystemTestCase(unittest.TestCase):
         # now .vcr file should exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), True)
 
-    @skip_if_py2
     def test_raise_if_not_needed(self):
         # define decorated function without any socket activity - this either
         # raises a UserWarning or Exception depending on raise_if_not_needed
@@ -349,10 +332,11 @@ class VCRSystemTestCase(unittest.TestCase):
         with catch_stdout() as out:
             with warnings.catch_warnings(record=True) as w:
                 warnings.simplefilter("always")
+                warnings.simplefilter("ignore", DeprecationWarning)
                 temp_test()
                 self.assertIn('VCR RECORDING', out.getvalue())
                 self.assertIn('no socket activity', str(w[-1].message))
-                self.assertEquals(w[-1].category, UserWarning)
+                self.assertEqual(w[-1].category, UserWarning)
 
         # .vcr file should not exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), False)
@@ -369,6 +353,71 @@ class VCRSystemTestCase(unittest.TestCase):
         # .vcr file should not exist
         self.assertEqual(os.path.exists(self.temp_test_vcr), False)
 
+    def test_clear_tape_cache(self):
+        # playback of an existing tape without any socket activity
+        @vcr(tape_name='test_core.read_test.vcr')
+        def read_test():
+            pass
+
+        VCRSystem.clear_tape_cache()
+        read_test()
+        # parsed tape is kept in memory
+        self.assertIn(self.read_test_vcr, _tape_cache)
+
+        VCRSystem.clear_tape_cache()
+        self.assertNotIn(self.read_test_vcr, _tape_cache)
+
+    def test_tape_cache_rereads_changed_tape(self):
+        @vcr(tape_name='test_core.temp_test.vcr')
+        def temp_test():
+            pass
+
+        # playback of a copy of an existing tape
+        shutil.copy(self.read_test_vcr, self.temp_test_vcr)
+        temp_test()
+        playlist = _tape_cache[self.temp_test_vcr][1]
+
+        # replace tape outside of vcr - differs in size
+        other_vcr = os.path.join(self.path, 'test_socket.test_arclink.vcr')
+        shutil.copy(other_vcr, self.temp_test_vcr)
+        temp_test()
+        # tape has been parsed again
+        stat = os.stat(self.temp_test_vcr)
+        key, new_playlist = _tape_cache[self.temp_test_vcr]
+        self.assertEqual(key, (stat.st_mtime_ns, stat.st_size))
+        self.assertNotEqual(len(new_playlist), len(playlist))
+
+    def test_empty_tape(self):
+        @vcr(tape_name='test_core.temp_test.vcr')
+        def temp_test():
+            pass
+
+        # create an empty tape file
+        open(self.temp_test_vcr, 'wb').close()
+        with self.assertRaisesRegex(IOError, "Empty VCR tape file"):
+            temp_test()
+
+    def test_tape_cache_size(self):
+        @vcr(tape_name='test_core.read_test.vcr')
+        def read_test():
+            pass
+
+        @vcr(tape_name='test_core.temp_test.vcr')
+        def temp_test():
+            pass
+
+        shutil.copy(self.read_test_vcr, self.temp_test_vcr)
+        VCRSystem.clear_tape_cache()
+        cache_size = core.TAPE_CACHE_SIZE
+        try:
+            core.TAPE_CACHE_SIZE = 1
+            read_test()
+            temp_test()
+        finally:
+            core.TAPE_CACHE_SIZE = cache_size
+        # least recently used tape got dropped
+        self.assertEqual(list(_tape_cache), [self.temp_test_vcr])
+
 
 if __name__ == '__main__':
     unittest.main()
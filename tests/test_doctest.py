@@ -12,7 +12,11 @@ from vcr import vcr
 # monkey patch DocTestCase
 def runTest(self):  # NOQA
     if '+VCR' in self._dt_test.docstring:
-        return vcr(self._runTest)()
+        # decorate only once per test case instance
+        func = self.__dict__.get('_vcr_runTest')
+        if func is None:
+            func = self.__dict__['_vcr_runTest'] = vcr(self._runTest)
+        return func()
     return self._runTest()
 
 
@@ -1,24 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
+from http.client import HTTPConnection, HTTPSConnection
+import os
 import unittest
+from urllib.parse import urlencode
 
 from vcr import vcr
 
-try:
-    # Py3
-    from urllib.parse import urlencode
-    from http.client import HTTPConnection, HTTPSConnection
-except ImportError:
-    # Py2
-    from urllib import urlencode
-    from httplib import HTTPConnection, HTTPSConnection
-
 
 class RequestsTestCase(unittest.TestCase):
     """
     Test suite using requests
     """
+    @unittest.skipUnless(os.environ.get('VCR_RUN_CONNECTIVITY'),
+                         'set VCR_RUN_CONNECTIVITY=1 to run live network test')
     def test_connectivity(self):
         # basic network connection test to exclude network issues
         conn = HTTPSConnection("www.python.org")
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
+import io
 import json
-import tempfile
+import os
 import unittest
 
 import requests
@@ -14,6 +15,8 @@ class RequestsTestCase(unittest.TestCase):
     """
     Test suite using requests
     """
+    @unittest.skipUnless(os.environ.get('VCR_RUN_CONNECTIVITY'),
+                         'set VCR_RUN_CONNECTIVITY=1 to run live network test')
     def test_connectivity(self):
         # basic network connection test to exclude network issues
         r = requests.get('https://www.python.org/')
@@ -33,11 +36,8 @@ class RequestsTestCase(unittest.TestCase):
 
     @vcr
     def test_http_post_file(self):
-        with tempfile.TemporaryFile(mode='wb+') as file:
-            file.write(b'test123')
-            file.seek(0)
-            files = {'file': file}
-            r = requests.post('http://httpbin.org/post', files=files)
+        files = {'file': io.BytesIO(b'test123')}
+        r = requests.post('http://httpbin.org/post', files=files)
         out = json.loads(r.text)
         self.assertEqual(out['files']['file'], 'test123')
 
@@ -3,7 +3,6 @@ from __future__ import absolute_import, division, print_function
 
 import select
 import socket
-import time
 import unittest
 
 
@@ -27,15 +26,10 @@ class SocketTestCase(unittest.TestCase):
             """
             Check a socket for write ability using select()
             """
-            start_time = time.time()
-            ready_to_write = []
-            while (sock not in ready_to_write) and \
-                  (time.time() - start_time) < timeout:
-                _ready_to_read, ready_to_write, _in_error = \
-                    select.select([sock], [sock], [], timeout)
-            if sock in ready_to_write:
-                return True
-            return False
+            # select blocks up to timeout - no need to poll in a loop
+            _ready_to_read, ready_to_write, _in_error = \
+                select.select([sock], [sock], [], timeout)
+            return sock in ready_to_write
 
         self.assertTrue(_is_connected_impl(s))
         s.close()
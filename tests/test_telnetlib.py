@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
+import contextlib
 import os
 import telnetlib
 import unittest
@@ -12,18 +13,15 @@ class TelnetlibTestCase(unittest.TestCase):
     """
     Test suite using telnetlib
     """
-    def setUp(self):
-        # Directory where the test files are located
-        self.path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
+    # Directory where the test files are located
+    path = os.path.join(os.path.dirname(__file__), 'vcrtapes')
+    temp_test_vcr = os.path.join(path,
+                                 'test_telnetlib.test_arclink_recording.vcr')
 
     def tearDown(self):
         # cleanup temporary files
-        tempfile = os.path.join(self.path,
-                                'test_telnetlib.test_arclink_recording.vcr')
-        try:
-            os.remove(tempfile)
-        except OSError:
-            pass
+        with contextlib.suppress(OSError):
+            os.remove(self.temp_test_vcr)
 
     @vcr
     def test_arclink(self):
@@ -2,18 +2,11 @@
 from __future__ import absolute_import, division, print_function
 
 import unittest
+from xmlrpc.client import ServerProxy
 
 from vcr import vcr
 
 
-try:
-    # Py3
-    from xmlrpc.client import ServerProxy
-except ImportError:
-    # Py2
-    from xmlrpclib import ServerProxy
-
-
 class XMLRPCTestCase(unittest.TestCase):
     """
     Test suite using xmlrpc
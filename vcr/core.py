@@ -23,9 +23,11 @@ Inspired by:
 """
 from __future__ import absolute_import, division, print_function
 
+import collections
 import copy
 import gzip
 import io
+import mmap
 import os
 import pickle
 import select
@@ -33,16 +35,20 @@ import socket
 import ssl
 import sys
 import telnetlib
-import tempfile
-import time
 import warnings
 
-from .utils import classproperty, PY2
+from .utils import classproperty
 
 
 VCR_RECORD = 0
 VCR_PLAYBACK = 1
 
+# maximal number of bytes fetched per read while recording a socket stream
+RECV_CHUNK_SIZE = 65536
+
+# py < 3.5 records sometimes an extra sendall call before makefile
+_NEEDS_SENDALL_FIXUP = sys.version_info < (3, 5)
+
 
 orig_socket = socket.socket
 orig_sslsocket = ssl.SSLSocket
@@ -52,6 +58,13 @@ orig_read_until = telnetlib.Telnet.read_until
 if hasattr(select, 'epoll'):
     orig_select_epoll = select.epoll
 
+# maximal number of parsed tapes kept in memory
+TAPE_CACHE_SIZE = 256
+# recently used parsed tapes - {path: ((mtime_ns, size), playlist)}
+_tape_cache = collections.OrderedDict()
+# file descriptor of the null device - see _get_dummy_fd
+_dummy_fd = None
+
 
 class VCRSystem(object):
     """
@@ -121,10 +134,17 @@ class VCRSystem(object):
         cls.recv_endmarkers = []
         cls.recv_size = None
 
+    @classmethod
+    def clear_tape_cache(cls):
+        """
+        Drop all parsed tapes kept in memory for playback
+        """
+        _tape_cache.clear()
+
     @classmethod
     def start(cls):
         # reset
-        cls.playlist = []
+        cls.playlist = collections.deque()
         cls.status = VCR_RECORD
         # apply monkey patches
         socket.socket = VCRSocket
@@ -148,7 +168,7 @@ class VCRSystem(object):
             select.select = orig_select_select
             telnetlib.Telnet.read_until = orig_read_until
         # reset
-        cls.playlist = []
+        cls.playlist = collections.deque()
         cls.status = VCR_RECORD
 
     @classproperty
@@ -160,18 +180,31 @@ class VCRSystem(object):
         return cls.status == VCR_PLAYBACK
 
 
+# types of playlist values which don't need to be copied
+_IMMUTABLE_TYPES = frozenset([bytes, str, int, float, bool, tuple, type(None)])
+
+
+def _copy_value(value):
+    """
+    Returns a copy of given value unless the value is immutable
+    """
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+    return copy.copy(value)
+
+
 def vcr_getaddrinfo(*args, **kwargs):
     if VCRSystem.status == VCR_RECORD:
         # record mode
         value = orig_getaddrinfo(*args, **kwargs)
         VCRSystem.playlist.append(
-            ('getaddrinfo', args, kwargs, copy.copy(value)))
+            ('getaddrinfo', args, kwargs, _copy_value(value)))
         if VCRSystem.debug:
             print('  ', 'vcr_getaddrinfo', args, kwargs, value)
         return value
     else:
         # playback mode
-        data = VCRSystem.playlist.pop(0)
+        data = VCRSystem.playlist.popleft()
         value = data[3]
         if VCRSystem.debug:
             print('  ', 'getaddrinfo', args, kwargs, ' | ', data[0:3],
@@ -231,6 +264,92 @@ def vcr_read_until(self, match, timeout=None):
         return orig_read_until(self, match, timeout=timeout)
 
 
+def _get_dummy_fd():
+    """
+    Returns a new file descriptor used as socket file number on playback
+
+    All descriptors are duplicates of a single read-only handle to the null
+    device, which gets opened on first use.
+    """
+    global _dummy_fd
+    if _dummy_fd is None:
+        _dummy_fd = os.open(os.devnull, os.O_RDONLY)
+    return os.dup(_dummy_fd)
+
+
+def _load_tape(tape):
+    """
+    Returns playlist of given tape file
+
+    Up to TAPE_CACHE_SIZE recently used tapes are kept in memory and reused
+    as long as modification time and size of the tape file do not change.
+    """
+    stat = os.stat(tape)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _tape_cache.pop(tape, None)
+    if cached is None or cached[0] != key:
+        if not stat.st_size:
+            # empty files can't be mapped into memory
+            msg = 'Empty VCR tape file: {}'
+            raise IOError(msg.format(tape))
+        # map tape file into memory instead of reading it in chunks
+        with open(tape, 'rb') as fh:
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            try:
+                playlist = pickle.load(gzip.GzipFile(fileobj=data))
+            except OSError:
+                # support for older uncompressed tapes
+                data.seek(0)
+                playlist = pickle.load(data)
+        finally:
+            data.close()
+        cached = (key, tuple(playlist))
+    # (re-)insert as most recently used tape and drop the oldest ones
+    _tape_cache[tape] = cached
+    while len(_tape_cache) > TAPE_CACHE_SIZE:
+        _tape_cache.popitem(last=False)
+    # return copies as values like BytesIO objects are consumed on playback
+    return collections.deque((name, args, kwargs, _copy_value(value))
+                             for name, args, kwargs, value in cached[1])
+
+
+def _write_tape(tape, playlist):
+    """
+    Writes playlist into given tape file
+
+    The playlist is written into a temporary file first which then replaces
+    any existing tape at once.
+    """
+    _tape_cache.pop(tape, None)
+    # make sure tape directory exists
+    path = os.path.dirname(tape)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    temp = '%s.%d.tmp' % (tape, os.getpid())
+    try:
+        with gzip.open(temp, 'wb') as fh:
+            pickle.dump(list(playlist), fh, protocol=2)
+        os.replace(temp, tape)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def _exec_method(name, owner='VCRSocket'):
+    """
+    Returns a method of class owner forwarding its calls to VCRSocket._exec
+    """
+    def method(self, *args, **kwargs):
+        return self._exec(name, *args, **kwargs)
+    method.__name__ = name
+    method.__qualname__ = owner + '.' + name
+    return method
+
+
 class VCRSocket(object):
     """
     """
@@ -243,11 +362,11 @@ class VCRSocket(object):
         self._orig_socket = orig_socket(family, type, proto, fileno)
         # a working file descriptor is needed for telnetlib.Telnet.read_until
         if not self._recording:
-            self.fd = tempfile.TemporaryFile()
+            self.fd = _get_dummy_fd()
 
     def __del__(self):
         if hasattr(self, 'fd'):
-            self.fd.close()
+            os.close(self.fd)
         self._orig_socket.close()
 
     def _exec(self, name, *args, **kwargs):
@@ -262,108 +381,89 @@ class VCRSocket(object):
                 temp = io.BytesIO()
                 self._orig_socket.setblocking(0)
                 self._orig_socket.settimeout(VCRSystem.recv_timeout)
-                begin = time.time()
                 # recording is slightly slower than running without vcr
                 # decorator as we don't know which concept is used to listen
-                # on the socket (size, end marker) - we have to wait for a
-                # socket timeout - on default its already quite low - but still
-                # it introduces a few extra seconds per recv request
+                # on the socket (size, end marker) - unless the peer closes
+                # the connection we have to wait for a socket timeout - on
+                # default its already quite low - but still it introduces a
+                # few extra seconds per recv request
                 #
                 # Note: sometimes recording fails due to the small timeout
                 # usually a retry helps - otherwise set the timeout higher for
                 # this test case using the recv_timeout parameter
                 while True:
-                    # endless loop - breaks by checking against recv_timeout
-                    if temp.tell() and \
-                       time.time() - begin > VCRSystem.recv_timeout:
-                        # got some data -> break after recv_timeout
-                        break
-                    elif time.time() - begin > VCRSystem.recv_timeout * 2:
-                        # no data yet -> break after 2 * recv_timeout
-                        break
-
+                    # reads block up to recv_timeout and raise on timeout
                     try:
                         if VCRSystem.recv_size:
                             data = value.read(len(VCRSystem.recv_size))
                         else:
-                            peeked_bytes = value.peek()
-                            data = value.read(len(peeked_bytes))
-                        if data:
-                            temp.write(data)
-                            begin = time.time()
-                        else:
-                            time.sleep(0.1 * VCRSystem.recv_timeout)
-                        # speed up closing socket by checking for end markers
-                        # by a given recv length
-                        if VCRSystem.recv_size:
-                            break
-                        elif VCRSystem.recv_endmarkers:
-                            for marker in VCRSystem.recv_endmarkers:
-                                if data.endswith(marker):
-                                    break
+                            # whatever is buffered or a single raw read
+                            data = value.read1(RECV_CHUNK_SIZE)
                     except socket.error:
                         break
+                    if not data:
+                        # connection closed by peer
+                        break
+                    temp.write(data)
+                    # speed up closing socket by checking for end markers
+                    # by a given recv length
+                    if VCRSystem.recv_size:
+                        break
+                    elif any(data.endswith(marker)
+                             for marker in VCRSystem.recv_endmarkers):
+                        break
                 temp.seek(0)
                 VCRSystem.playlist.append((name, args, kwargs, temp))
                 # return new copy of BytesIO as it may get closed
                 return copy.copy(temp)
             # add to playlist
-            VCRSystem.playlist.append((name, args, kwargs, copy.copy(value)))
+            VCRSystem.playlist.append(
+                (name, args, kwargs, _copy_value(value)))
             return value
         else:
             # playback mode
             # get first element in playlist
-            data = VCRSystem.playlist.pop(0)
+            playlist = VCRSystem.playlist
+            data = playlist.popleft()
             # XXX: py < 3.5 has sometimes two sendall calls ???
-            if sys.version_info < (3, 5) and name == 'makefile' and \
+            if _NEEDS_SENDALL_FIXUP and name == 'makefile' and \
                data[0] == 'sendall':
-                data = VCRSystem.playlist.pop(0)
+                data = playlist.popleft()
             value = data[3]
             if VCRSystem.debug:
                 print('  ', name, args, kwargs, ' | ', data[0:3], '->', value)
             return value
 
-    def __nonzero__(self):
-        return bool(self.__dict__.get('_orig_socket', True))
-
-    def send(self, *args, **kwargs):
-        return self._exec('send', *args, **kwargs)
-
-    def sendall(self, *args, **kwargs):
-        return self._exec('sendall', *args, **kwargs)
+    # socket methods which are recorded and replayed
+    send = _exec_method('send')
+    sendall = _exec_method('sendall')
+    makefile = _exec_method('makefile')
+    getsockopt = _exec_method('getsockopt')
+    recv = _exec_method('recv')
+    gettimeout = _exec_method('gettimeout')
+    connect = _exec_method('connect')
+    detach = _exec_method('detach')
 
     def fileno(self, *args, **kwargs):
         if self._recording:
             value = self._orig_socket.fileno(*args, **kwargs)
         else:
-            value = self.fd.fileno()
+            value = self.fd
         if VCRSystem.debug:
             print('  ', 'fileno', args, kwargs, '->', value)
         return value
 
-    def makefile(self, *args, **kwargs):
-        return self._exec('makefile', *args, **kwargs)
-
-    def getsockopt(self, *args, **kwargs):
-        return self._exec('getsockopt', *args, **kwargs)
-
     def setsockopt(self, *args, **kwargs):
         if VCRSystem.debug:
             print('  ', 'setsockopt', args, kwargs)
         if self._recording:
             return self._orig_socket.setsockopt(*args, **kwargs)
 
-    def recv(self, *args, **kwargs):
-        return self._exec('recv', *args, **kwargs)
-
     def close(self):
         if VCRSystem.debug:
             print('  ', 'close')
         return self._orig_socket.close()
 
-    def gettimeout(self, *args, **kwargs):
-        return self._exec('gettimeout', *args, **kwargs)
-
     def settimeout(self, *args, **kwargs):
         if VCRSystem.debug:
             print('  ', 'settimeout', args, kwargs)
@@ -376,12 +476,6 @@ class VCRSocket(object):
         if self._recording:
             return self._orig_socket.setblocking(*args, **kwargs)
 
-    def connect(self, *args, **kwargs):
-        return self._exec('connect', *args, **kwargs)
-
-    def detach(self, *args, **kwargs):
-        return self._exec('detach', *args, **kwargs)
-
     @property
     def family(self):
         return self._orig_socket.family
@@ -404,10 +498,44 @@ class VCRSSLSocket(VCRSocket):
                                            *args, **kwargs)
         # a working file descriptor is needed for telnetlib.Telnet.read_until
         if not self._recording:
-            self.fd = tempfile.TemporaryFile()
+            self.fd = _get_dummy_fd()
 
-    def getpeercert(self, *args, **kwargs):
-        return self._exec('getpeercert', *args, **kwargs)
+    getpeercert = _exec_method('getpeercert', 'VCRSSLSocket')
+
+
+def _get_tape(func, tape_name=None):
+    """
+    Returns tape file and test name for given decorated function
+    """
+    if func.__module__ == 'doctest':
+        source_filename = func.__self__._dt_test.filename
+        file_name = os.path.splitext(os.path.basename(source_filename))[0]
+        # check if a tests directory exists
+        path = os.path.join(os.path.dirname(source_filename), 'tests')
+        if os.path.exists(path):
+            # ./test/vcrtapes/tape_name.vcr
+            path = os.path.join(os.path.dirname(source_filename),
+                                'tests', 'vcrtapes')
+        else:
+            # ./vcrtapes/tape_name.vcr
+            path = os.path.join(os.path.dirname(source_filename), 'vcrtapes')
+        func_name = func.__self__._dt_test.name.split('.')[-1]
+    else:
+        source_filename = func.__code__.co_filename
+        file_name = os.path.splitext(os.path.basename(source_filename))[0]
+        path = os.path.join(os.path.dirname(source_filename), 'vcrtapes')
+        func_name = func.__name__
+
+    if tape_name:
+        # tape file name is given - either full path is given or use
+        # 'vcrtapes' directory
+        if os.sep in tape_name:
+            path = os.path.dirname(os.path.abspath(tape_name))
+        tape = os.path.join(path, '%s' % (tape_name))
+    else:
+        # auto-generated file name
+        tape = os.path.join(path, '%s.%s.vcr' % (file_name, func_name))
+    return tape, func_name
 
 
 def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
@@ -431,6 +559,9 @@ def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
         """
         Wrapper around _vcr_inner allowing optional arguments on decorator
         """
+        # tape file and test name - resolved on first call
+        resolved = []
+
         def _vcr_inner(*args, **kwargs):
             """
             The actual decorator doing a lot of monkey patching and auto magic
@@ -440,45 +571,9 @@ def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
                 return func(*args, **kwargs)
 
             # prepare VCR tape
-            if func.__module__ == 'doctest':
-                source_filename = func.__self__._dt_test.filename
-                file_name = os.path.splitext(
-                    os.path.basename(source_filename))[0]
-                # check if a tests directory exists
-                path = os.path.join(os.path.dirname(source_filename),
-                                    'tests')
-                if os.path.exists(path):
-                    # ./test/vcrtapes/tape_name.vcr
-                    path = os.path.join(os.path.dirname(source_filename),
-                                        'tests', 'vcrtapes')
-                else:
-                    # ./vcrtapes/tape_name.vcr
-                    path = os.path.join(os.path.dirname(source_filename),
-                                        'vcrtapes')
-                func_name = func.__self__._dt_test.name.split('.')[-1]
-            else:
-                source_filename = func.__code__.co_filename
-                file_name = os.path.splitext(
-                    os.path.basename(source_filename))[0]
-                path = os.path.join(
-                    os.path.dirname(source_filename), 'vcrtapes')
-                func_name = func.__name__
-
-            if tape_name:
-                # tape file name is given - either full path is given or use
-                # 'vcrtapes' directory
-                if os.sep in tape_name:
-                    temp = os.path.abspath(tape_name)
-                    path = os.path.dirname(temp)
-                    if not os.path.isdir(path):
-                        os.makedirs(path)
-                tape = os.path.join(path, '%s' % (tape_name))
-            else:
-                # make sure 'vcrtapes' directory exists
-                if not os.path.isdir(path):
-                    os.makedirs(path)
-                # auto-generated file name
-                tape = os.path.join(path, '%s.%s.vcr' % (file_name, func_name))
+            if not resolved:
+                resolved.append(_get_tape(func, tape_name))
+            tape, func_name = resolved[0]
 
             # enable VCR
             with VCRSystem(debug=debug):
@@ -487,15 +582,6 @@ def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
                         not os.path.isfile(tape) or
                         overwrite or VCRSystem.overwrite):
                     # record mode
-                    if PY2:
-                        msg = 'VCR records only in PY3 to be backward ' + \
-                              'compatible with PY2 - skipping VCR ' + \
-                              'mechanics for %s'
-                        warnings.warn(msg % (func.__name__))
-                        # disable VCR
-                        VCRSystem.stop()
-                        # execute decorated function without VCR
-                        return func(*args, **kwargs)
                     if VCRSystem.debug:
                         print('\nVCR RECORDING (%s) ...' % (func_name))
                     VCRSystem.status = VCR_RECORD
@@ -510,14 +596,8 @@ def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
                         else:
                             warnings.warn(msg)
                     else:
-                        # remove existing tape
-                        try:
-                            os.remove(tape)
-                        except OSError:
-                            pass
                         # write playlist to file
-                        with gzip.open(tape, 'wb') as fh:
-                            pickle.dump(VCRSystem.playlist, fh, protocol=2)
+                        _write_tape(tape, VCRSystem.playlist)
                 else:
                     # playback mode
                     if VCRSystem.debug:
@@ -528,13 +608,7 @@ def vcr(decorated_func=None, debug=False, overwrite=False, disabled=False,
                         msg = 'Missing VCR tape file for playback: {}'
                         raise IOError(msg.format(tape))
                     # load playlist
-                    try:
-                        with gzip.open(tape, 'rb') as fh:
-                            VCRSystem.playlist = pickle.load(fh)
-                    except OSError:
-                        # support for older uncompressed tapes
-                        with open(tape, 'rb') as fh:
-                            VCRSystem.playlist = pickle.load(fh)
+                    VCRSystem.playlist = _load_tape(tape)
                     if VCRSystem.debug:
                         print('Loaded playlist:')
                         for i, item in enumerate(VCRSystem.playlist):
@@ -1,47 +1,32 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
-from contextlib import contextmanager
-import io
-import sys
-import unittest
+from contextlib import redirect_stdout
+from io import StringIO as CaptureIO
 
 
-try:
-    from contextlib import redirect_stdout
-except ImportError:
-    # Python < 3.4
-    @contextmanager
-    def redirect_stdout(new_target):
-        old_target, sys.stdout = sys.stdout, new_target
-        try:
-            yield new_target
-        finally:
-            sys.stdout = old_target
+# Python 2 is not supported anymore - PY2 and skip_if_py2 are kept for
+# backward compatibility only
+PY2 = False
 
 
-try:
-    # PY2
-    PY2 = True
-    from StringIO import StringIO as CaptureIO  # @UnresolvedImport
-except ImportError:
-    # PY3
-    PY2 = False
+def catch_stdout(buf=None):
+    """
+    Redirect stdout into a CaptureIO buffer
 
-    class CaptureIO(io.TextIOWrapper):
-        def __init__(self):
-            super(CaptureIO, self).__init__(io.BytesIO(), encoding='UTF-8',
-                                            newline='', write_through=True)
-
-        def getvalue(self):
-            return self.buffer.getvalue().decode('UTF-8')
-
-
-def catch_stdout():
-    return redirect_stdout(CaptureIO())
+    An existing buffer may be given to reuse it - its content gets cleared.
+    """
+    if buf is None:
+        buf = CaptureIO()
+    else:
+        buf.seek(0)
+        buf.truncate(0)
+    return redirect_stdout(buf)
 
 
 class classproperty(object):
+    __slots__ = ('fget',)
+
     def __init__(self, fget):
         self.fget = fget
 
@@ -50,8 +35,4 @@ class classproperty(object):
 
 
 def skip_if_py2(func):
-    def wrapper(*args, **kwargs):
-        if PY2:
-            raise unittest.SkipTest('recording in PY2 is not supported')
-        return func(*args, **kwargs)
-    return wrapper
+    return func